@@ -1,191 +1,567 @@
 import math
-import requests
+import asyncio
+import concurrent.futures
+import contextlib
+import hashlib
+import itertools
+import multiprocessing
+import shelve
+import aiofiles
+import httpx
+import numpy as np
 from pyproj import Transformer
 from PIL import Image
 from io import BytesIO
-import concurrent.futures
-from functools import partial
+from functools import lru_cache
+from collections import OrderedDict
 import argparse
+import logging
+import re
 import os
 import rasterio
 from rasterio.crs import CRS
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+try:
+    import numba
+    from numba import prange
+except ImportError:  # numba is optional; fall back to NumPy
+    numba = None
+    prange = range
+
+try:
+    import pyvips
+except (ImportError, OSError):  # pyvips is optional; fall back to Pillow
+    pyvips = None
+
+
+logger = logging.getLogger(__name__)
+
+_UTM_WKT_RE = re.compile(r"UTM zone (\d+)\s*([NS])", re.I)
+
+# Half the width of the Web Mercator (EPSG:3857) world, in metres
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+MAX_WORKERS = 32
+
+# Responses retried with exponential backoff (RETRY_BACKOFF * 2**attempt seconds)
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+
+# Coordinate arrays smaller than this skip the Numba kernels
+NUMBA_MIN_POINTS = 100_000
+
+# Decoded tiles kept for reuse when the same tile bytes come back again
+DECODED_CACHE_SIZE = 64
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Mosaics larger than this (64 tiles of 256x256) are saved by libvips when available
+VIPS_MIN_PIXELS = 64 * 256 * 256
+
+
+def make_client(base_url, max_connections=MAX_CONNECTIONS):
+    """Create an HTTP/2 client that multiplexes tile requests over few connections."""
+    limits = httpx.Limits(max_connections=max_connections,
+                          max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=3)
+    # No pool timeout: with a large grid most requests wait for a free stream
+    timeout = httpx.Timeout(10.0, connect=3.0, pool=None)
+    return httpx.AsyncClient(base_url=base_url, transport=transport, timeout=timeout)
+
+
+def utm_zone_from_crs(crs):
+    """Return (zone, northern) for a UTM rasterio CRS, or None if it is not UTM."""
+    # Geographic or missing CRSs can't be UTM; skip the EPSG lookup and WKT
+    if crs is None or not crs.is_projected:
+        return None
+    
+    # Cheapest signal first. EPSG codes for UTM North: 326xx, UTM South: 327xx (xx = zone)
+    epsg = crs.to_epsg()
+    if epsg:
+        if 32601 <= epsg <= 32660:
+            return epsg - 32600, True
+        if 32701 <= epsg <= 32760:
+            return epsg - 32700, False
+    
+    # Fall back to a single pass of the precompiled regex over the WKT
+    match = _UTM_WKT_RE.search(crs.wkt)
+    if match:
+        return int(match.group(1)), match.group(2).upper() == "N"
+    
+    # Last resort for proj4-defined UTM, whose WKT is just named "unknown"
+    params = crs.to_dict()
+    if params.get("proj") == "utm" and "zone" in params:
+        return int(params["zone"]), "south" not in params
+    return None
 
 
 def extract_geotiff_info(tif_file):
-    """Extract UTM zone and corner coordinates from a GeoTIFF file."""
+    """Extract UTM zone, hemisphere and corner coordinates from a GeoTIFF file.
+    
+    Returns (utm_zone, northern, ulx, uly, lrx, lry).
+    """
     if not os.path.exists(tif_file):
         raise FileNotFoundError(f"GeoTIFF file not found: {tif_file}")
     
     # Open the dataset with rasterio
     with rasterio.open(tif_file) as src:
-        # Get the CRS
-        crs = src.crs
-        
-        # Extract UTM zone from CRS
-        utm_zone = None
-        if crs.is_projected:
-            # Try to get UTM zone from CRS
-            try:
-                if hasattr(crs, 'to_dict') and 'proj' in crs.to_dict() and crs.to_dict()['proj'] == 'utm':
-                    utm_zone = crs.to_dict().get('zone')
-                
-                # If that didn't work, try parsing it from WKT
-                if utm_zone is None and hasattr(crs, 'wkt'):
-                    wkt = crs.wkt
-                    if "UTM" in wkt and "zone" in wkt.lower():
-                        parts = wkt.split()
-                        for i, part in enumerate(parts):
-                            if part.lower() == "zone":
-                                try:
-                                    utm_zone = int(parts[i+1].rstrip(',').rstrip(']'))
-                                    break
-                                except (IndexError, ValueError):
-                                    pass
-            except Exception as e:
-                print(f"Error extracting UTM zone: {e}")
-        
-        # If UTM zone not found, try EPSG code
-        if utm_zone is None and crs.is_epsg_code:
-            epsg = crs.to_epsg()
-            if epsg:
-                # EPSG codes for UTM North: 326xx, UTM South: 327xx (xx = zone)
-                if 32601 <= epsg <= 32660:
-                    utm_zone = epsg - 32600
-                elif 32701 <= epsg <= 32760:
-                    utm_zone = epsg - 32700
-        
-        # Get bounds in projected coordinates
-        ulx, lry, lrx, uly = src.bounds
-        
-        # Get image dimensions for more accurate bounds
-        width = src.width
-        height = src.height
+        utm = utm_zone_from_crs(src.crs)
         
-        # Transform from pixel to projected coordinates
+        # Corners in projected coordinates, straight from the affine transform
+        # (also correct for rotated or sheared rasters, unlike src.bounds)
         transform = src.transform
+        ulx, uly = transform * (0, 0)
+        lrx, lry = transform * (src.width, src.height)
         
-        # Calculate precise corners
-        precise_ulx, precise_uly = transform * (0, 0)
-        precise_lrx, precise_lry = transform * (width, height)
+        if utm is None:
+            logger.warning("Could not determine UTM zone from GeoTIFF. Using default zone 32N.")
+            utm = 32, True
+        utm_zone, northern = utm
         
-        if utm_zone is None:
-            print("Warning: Could not determine UTM zone from GeoTIFF. Using default zone 32.")
-            utm_zone = 32
-        
-    print(f"Extracted GeoTIFF info: UTM Zone {utm_zone}")
-    print(f"Upper-left: ({precise_ulx}, {precise_uly}), Lower-right: ({precise_lrx}, {precise_lry})")
+    logger.info("Extracted GeoTIFF info: UTM Zone %d%s", utm_zone, "N" if northern else "S")
+    logger.info("Upper-left: (%s, %s), Lower-right: (%s, %s)", ulx, uly, lrx, lry)
     
-    return utm_zone, precise_ulx, precise_uly, precise_lrx, precise_lry
+    return utm_zone, northern, ulx, uly, lrx, lry
+
+
+@lru_cache(maxsize=64)
+def _get_transformer(zone, northern):
+    """Return a cached UTM -> WGS84 transformer for the given zone."""
+    epsg = (32600 if northern else 32700) + zone
+    return Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
 
 
 def utm_to_latlon(x, y, zone=32, northern=True):
     """Convert UTM coordinates to latitude/longitude."""
-    transformer = Transformer.from_crs(f"EPSG:326{zone}", "EPSG:4326", always_xy=True)
-    lon, lat = transformer.transform(x, y)  # Returns (lon, lat)
+    lon, lat = _get_transformer(zone, northern).transform(x, y)  # Returns (lon, lat)
     return lat, lon  # Return in (lat, lon) order
 
 
+def utm_to_latlon_many(xs, ys, zone=32, northern=True):
+    """Convert arrays of UTM coordinates to latitude/longitude in one call."""
+    lons, lats = _get_transformer(zone, northern).transform(np.asarray(xs), np.asarray(ys))
+    return lats, lons
+
+
+def utm_inv(x, y, zone=32, northern=True):
+    """Convert WGS84 UTM coordinates to (lat, lon) in degrees without pyproj.
+    
+    Inverse transverse Mercator series from Snyder, "Map Projections: A
+    Working Manual" (USGS PP 1395), pp. 63-64; accurate to about a
+    centimetre within 200 km of the central meridian. Works on scalars
+    and NumPy arrays, and compiles under Numba.
+    """
+    k0 = 0.9996
+    a = 6378137.0
+    e2 = 0.0066943799901413165  # WGS84 first eccentricity squared
+    ep2 = e2 / (1 - e2)
+    e1 = (1 - np.sqrt(1 - e2)) / (1 + np.sqrt(1 - e2))
+    
+    # Footpoint latitude from the meridional arc
+    m = (y if northern else y - 10000000.0) / k0
+    mu = m / (a * (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256))
+    phi1 = (mu
+            + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * np.sin(2 * mu)
+            + (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * np.sin(4 * mu)
+            + (151 * e1 ** 3 / 96) * np.sin(6 * mu)
+            + (1097 * e1 ** 4 / 512) * np.sin(8 * mu))
+    
+    sin_phi1 = np.sin(phi1)
+    cos_phi1 = np.cos(phi1)
+    tan_phi1 = sin_phi1 / cos_phi1
+    c1 = ep2 * cos_phi1 ** 2
+    t1 = tan_phi1 ** 2
+    w = 1 - e2 * sin_phi1 ** 2
+    n1 = a / np.sqrt(w)
+    r1 = a * (1 - e2) / w ** 1.5
+    d = (x - 500000.0) / (n1 * k0)
+    
+    lat = phi1 - (n1 * tan_phi1 / r1) * (
+        d ** 2 / 2
+        - (5 + 3 * t1 + 10 * c1 - 4 * c1 ** 2 - 9 * ep2) * d ** 4 / 24
+        + (61 + 90 * t1 + 298 * c1 + 45 * t1 ** 2 - 252 * ep2 - 3 * c1 ** 2) * d ** 6 / 720)
+    lon = (d
+           - (1 + 2 * t1 + c1) * d ** 3 / 6
+           + (5 - 2 * c1 + 28 * t1 - 3 * c1 ** 2 + 8 * ep2 + 24 * t1 ** 2) * d ** 5 / 120) / cos_phi1
+    lon0 = (zone - 1) * 6 - 180 + 3
+    # Wrap into [-180, 180) for zones next to the antimeridian
+    return np.degrees(lat), (lon0 + np.degrees(lon) + 180) % 360 - 180
+
+
+_utm_inv_point = utm_inv
+
+
+def _utm_inv_loop(xs, ys, zone, northern, out_lat, out_lon):
+    """Fill out_lat/out_lon point by point; compiled with Numba when available."""
+    for i in prange(xs.size):
+        out_lat[i], out_lon[i] = _utm_inv_point(xs[i], ys[i], zone, northern)
+
+
+if numba is not None:
+    _utm_inv_point = numba.njit(cache=True)(utm_inv)
+    _utm_inv_loop = numba.njit(parallel=True, cache=True)(_utm_inv_loop)
+
+
+def utm_inv_many(xs, ys, zone=32, northern=True):
+    """Convert arrays of UTM coordinates to (lats, lons) with the inline formula.
+    
+    Uses a parallel Numba loop when numba is installed, NumPy otherwise.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if numba is None:
+        return utm_inv(xs, ys, zone, northern)
+    xs, ys = np.broadcast_arrays(xs, ys)
+    lats = np.empty(xs.shape, dtype=np.float64)
+    lons = np.empty(xs.shape, dtype=np.float64)
+    _utm_inv_loop(xs.ravel(), ys.ravel(), zone, northern, lats.reshape(-1), lons.reshape(-1))
+    return lats, lons
+
+
+def _tiles_from_latlon(lat, lon, zoom, out_x, out_y):
+    """Fill out_x/out_y with tile indices; compiled with Numba when available."""
+    n = 1 << zoom
+    for i in prange(lat.size):
+        r = math.radians(lat[i])
+        out_x[i] = int((lon[i] + 180.0) * n / 360.0)
+        out_y[i] = int((1 - math.log(math.tan(r) + 1 / math.cos(r)) / math.pi) * n / 2)
+
+
+if numba is not None:
+    _tiles_from_latlon = numba.njit(parallel=True, fastmath=True, cache=True)(_tiles_from_latlon)
+
+
 def lat_lon_to_tile_indices(lat, lon, zoom):
-    """Convert latitude/longitude to tile indices for a given zoom level."""
-    n = 2 ** zoom
-    x_tile = int((lon + 180) / 360 * n)
-    y_tile = int((1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2 * n)
+    """Convert latitude/longitude to tile indices for a given zoom level.
+    
+    Accepts scalars or array-likes; scalars return plain ints, arrays
+    return int64 arrays of the same shape. Arrays of at least
+    NUMBA_MIN_POINTS go through a Numba kernel when numba is installed;
+    below that, JIT and thread start-up cost more than they save.
+    """
+    scalar = np.isscalar(lat) and np.isscalar(lon)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if numba is not None and not scalar and max(lat.size, lon.size) >= NUMBA_MIN_POINTS:
+        lat, lon = np.broadcast_arrays(lat, lon)
+        out_x = np.empty(lat.shape, dtype=np.int64)
+        out_y = np.empty(lat.shape, dtype=np.int64)
+        _tiles_from_latlon(lat.ravel(), lon.ravel(), zoom, out_x.reshape(-1), out_y.reshape(-1))
+        return out_x, out_y
+    n = 1 << zoom
+    lat_rad = np.radians(lat)
+    x_tile = ((lon + 180.0) * (n / 360.0)).astype(np.int64)
+    y_tile = ((1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) * (n / 2)).astype(np.int64)
+    if scalar:
+        return int(x_tile), int(y_tile)
     return x_tile, y_tile
 
 
-def download_tile(x, y, z, base_url):
-    """Download a single tile from the tile server."""
-    url = f"{base_url}/{z}/{x}/{y}.webp"
-    print(f"Attempting URL: {url}")
-    response = requests.get(url)
-    if response.status_code == 200:
-        print(f"Successfully fetched tile: X={x}, Y={y}")
-        return Image.open(BytesIO(response.content))
-    else:
-        print(f"Failed to fetch tile: {url} (HTTP {response.status_code})")
+def _retry_delay(status_code, attempt):
+    """Return the backoff before retrying a request, or None to stop retrying."""
+    if status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
         return None
+    return RETRY_BACKOFF * 2 ** attempt
 
 
-def stitch_tiles(tiles_dict, x_range, y_range):
-    """Stitch tiles into a single large image.
+@contextlib.asynccontextmanager
+async def _tile_response(client, url, headers=None):
+    """Stream GET url, retrying rate-limit and server errors with backoff.
     
-    Args:
-        tiles_dict: Dictionary of tiles with (x,y) coordinates as keys
-        x_range: (min_x, max_x) tile coordinate range
-        y_range: (min_y, max_y) tile coordinate range
+    Yields the first response that is not retried (or the last attempt),
+    with its body still unread. Both download paths go through here so
+    they share one retry policy.
     """
-    if not tiles_dict:
-        return None
-        
-    # Get sample tile size
-    sample_tile = next(iter(tiles_dict.values()))
-    width, height = sample_tile.size
-    grid_width = x_range[1] - x_range[0] + 1
-    grid_height = y_range[1] - y_range[0] + 1
-    
-    stitched = Image.new("RGB", (width * grid_width, height * grid_height))
-    
-    # Iterate through coordinates in correct order
-    for y in range(y_range[0], y_range[1] + 1):
-        for x in range(x_range[0], x_range[1] + 1):
-            if (x, y) in tiles_dict:
-                tile = tiles_dict[(x, y)]
-                x_offset = (x - x_range[0]) * width
-                y_offset = (y - y_range[0]) * height
-                stitched.paste(tile, (x_offset, y_offset))
-    
-    return stitched
-
-
-def download_tiles_parallel(x_start, x_end, y_start, y_end, zoom, base_url, max_workers=10):
-    """Download multiple tiles in parallel using a thread pool."""
-    tiles_dict = {}
-    
-    def download_single_tile(coords):
-        x, y = coords
-        tile = download_tile(x, y, zoom, base_url)
-        if tile:
-            return (x, y), tile
-        return None
+    for attempt in itertools.count():
+        logger.debug("Attempting URL: %s%s", client.base_url, url)
+        async with client.stream("GET", url, headers=headers) as response:
+            delay = _retry_delay(response.status_code, attempt)
+            if delay is None:
+                yield response
+                return
+        # Sleep outside the stream so the connection goes back to the pool
+        logger.debug("HTTP %d for %s%s, retrying in %.1fs", response.status_code,
+                     client.base_url, url, delay)
+        await asyncio.sleep(delay)
+
+
+def _tile_coords(x_start, x_end, y_start, y_end):
+    """Return a generator of the grid's (x, y) tile coordinates in row-major order.
     
-    # Create all coordinate pairs
-    coords = [(x, y) for x in range(x_start, x_end + 1) 
-                    for y in range(y_start, y_end + 1)]
+    Tiles then tend to arrive in the output's memory order, so writes
+    sweep through it instead of jumping between tile rows.
+    """
+    return ((x, y) for y in range(y_start, y_end + 1)
+                   for x in range(x_start, x_end + 1))
+
+
+async def download_tile(client, x, y, cache=None):
+    """Download a single tile from the tile server and return its raw bytes.
     
-    # Use ThreadPoolExecutor for parallel downloads
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all download tasks
-        future_to_coords = {executor.submit(download_single_tile, coord): coord 
-                          for coord in coords}
-        
-        # Collect results as they complete
-        for future in concurrent.futures.as_completed(future_to_coords):
-            result = future.result()
-            if result:
-                coords, tile = result
-                tiles_dict[coords] = tile
+    The client's base URL already ends in the zoom level. Rate-limit and
+    server errors are retried with exponential backoff. If a cache
+    mapping of {url: (etag, body)} is given, known tiles are revalidated
+    with If-None-Match and a 304 reuses the cached body.
+    """
+    url = f"{x}/{y}.webp"
+    key = f"{client.base_url}{url}"
+    cached = cache.get(key) if cache is not None else None
+    headers = {"If-None-Match": cached[0]} if cached else None
+    async with _tile_response(client, url, headers) as response:
+        if response.status_code == 304 and cached:
+            logger.debug("Tile unchanged, using cached copy: X=%d, Y=%d", x, y)
+            return cached[1]
+        if response.status_code == 200:
+            body = await response.aread()
+            logger.debug("Successfully fetched tile: X=%d, Y=%d", x, y)
+            etag = response.headers.get("ETag")
+            if cache is not None and etag:
+                cache[key] = (etag, body)
+            return body
+        else:
+            logger.warning("Failed to fetch tile: %s (HTTP %d)", key, response.status_code)
+            return None
+
+
+def _decode_webp(raw):
+    """Decode raw tile bytes into an (H, W, 3) uint8 array.
     
-    return tiles_dict
+    Runs in a worker process, so it must stay a module-level function.
+    """
+    # BytesIO shares the body buffer rather than copying it
+    img = Image.open(BytesIO(raw))
+    # Tiles are normally RGB already; convert() would still copy them
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img)
 
 
-def get_tile_bounds_for_utm_region(ul_x, ul_y, lr_x, lr_y, zoom, utm_zone=32):
+def save_canvas(canvas, output_filename):
+    """Save a stitched (H, W, 3) canvas to disk.
+    
+    Large canvases are encoded by libvips when available, wrapping the
+    array directly instead of building a Pillow image first.
+    """
+    height, width = canvas.shape[:2]
+    if pyvips is not None and height * width > VIPS_MIN_PIXELS:
+        pyvips.Image.new_from_array(canvas).write_to_file(output_filename)
+    else:
+        Image.fromarray(canvas).save(output_filename)
+
+
+async def iter_tiles_async(x_start, x_end, y_start, y_end, zoom, base_url,
+                           max_workers=MAX_WORKERS, max_connections=MAX_CONNECTIONS,
+                           cache=None):
+    """Download and decode tiles concurrently, yielding (x, y, tile) as they arrive.
+    
+    max_workers fetchers feed decoded tiles through a bounded queue to the
+    consumer, so only O(max_workers) tiles are ever held in memory
+    regardless of grid size. Identical tiles (e.g. empty ocean) are
+    decoded once. cache is passed on to download_tile. Tiles that fail
+    to download are skipped.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=2 * max_workers)
+    decoded = OrderedDict()  # content digest -> decoded tile, most recent last
+    coords = _tile_coords(x_start, x_end, y_start, y_end)
+    
+    async def fetch(x, y):
+        try:
+            raw = await download_tile(client, x, y, cache)
+            if raw is None:
+                return None
+            digest = hashlib.blake2b(raw, digest_size=16).digest()
+            if digest in decoded:
+                decoded.move_to_end(digest)
+                return decoded[digest]
+            # Decode off the event loop, in parallel across CPU cores
+            tile = await loop.run_in_executor(decoder, _decode_webp, raw)
+            decoded[digest] = tile
+            if len(decoded) > DECODED_CACHE_SIZE:
+                decoded.popitem(last=False)
+            return tile
+        except (httpx.HTTPError, OSError) as e:
+            logger.warning("Error fetching tile: X=%d, Y=%d (%r)", x, y, e)
+            return None
+    
+    async def worker():
+        # Workers share the coords generator, so each tile is fetched once
+        for x, y in coords:
+            tile = await fetch(x, y)
+            if tile is not None:
+                await queue.put((x, y, tile))  # blocks while the consumer catches up
+    
+    async def produce():
+        try:
+            await asyncio.gather(*(worker() for _ in range(max_workers)))
+        except asyncio.CancelledError:
+            raise  # the consumer is gone; a blocking put() would never return
+        except Exception:
+            await queue.put(None)  # wake the consumer, which re-raises via await producer
+            raise
+        await queue.put(None)  # sentinel: all tiles are in
+    
+    # Never fork: Numba may already have started its worker threads, and
+    # forking a multi-threaded process can hang the interpreter at exit
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    decoder_context = multiprocessing.get_context(start_method)
+    with concurrent.futures.ProcessPoolExecutor(mp_context=decoder_context) as decoder:
+        # Hoist the zoom level into the base URL once for every tile
+        async with make_client(f"{base_url}/{zoom}", max_connections) as client:
+            producer = asyncio.create_task(produce())
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    yield item
+                await producer
+            finally:
+                # Also reached when the consumer fails or is cancelled mid-grid
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+
+
+async def download_mosaic_async(x_start, x_end, y_start, y_end, zoom, base_url, **download_options):
+    """Download tiles and stitch each one into an in-memory mosaic as it arrives.
+    
+    Returns an (H, W, 3) uint8 array, or None if no tile was downloaded.
+    Missing tiles are left black.
+    """
+    grid_width = x_end - x_start + 1
+    grid_height = y_end - y_start + 1
+    canvas = None
+    
+    tiles = iter_tiles_async(x_start, x_end, y_start, y_end, zoom, base_url, **download_options)
+    try:
+        async for x, y, tile in tiles:
+            # Tile size is only known once the first tile is in
+            height, width = tile.shape[:2]
+            if canvas is None:
+                canvas = np.zeros((height * grid_height, width * grid_width, 3), dtype=np.uint8)
+            
+            x_offset = (x - x_start) * width
+            y_offset = (y - y_start) * height
+            canvas[y_offset:y_offset + height, x_offset:x_offset + width] = tile
+    finally:
+        # Stop the fetchers now rather than when the generator is collected
+        await tiles.aclose()
+    
+    return canvas
+
+
+async def dump_tiles_async(x_start, x_end, y_start, y_end, zoom, base_url, dump_dir,
+                           max_workers=MAX_WORKERS, max_connections=MAX_CONNECTIONS):
+    """Stream raw tiles to dump_dir as <zoom>_<x>_<y>.webp without decoding them.
+    
+    Returns the number of tiles written.
+    """
+    saved = 0
+    coords = _tile_coords(x_start, x_end, y_start, y_end)
+    
+    async def dump(x, y):
+        url = f"{x}/{y}.webp"
+        async with _tile_response(client, url) as response:
+            if response.status_code != 200:
+                logger.warning("Failed to fetch tile: %s%s (HTTP %d)",
+                               client.base_url, url, response.status_code)
+                return False
+            tile_path = os.path.join(dump_dir, f"{zoom}_{x}_{y}.webp")
+            # Stream into a .part file so an interrupted download never
+            # leaves a truncated tile under the final name
+            part_path = tile_path + ".part"
+            try:
+                async with aiofiles.open(part_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(65536):
+                        await f.write(chunk)
+                os.replace(part_path, tile_path)
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(part_path)
+                raise
+        logger.debug("Saved tile: X=%d, Y=%d", x, y)
+        return True
+    
+    async def worker():
+        nonlocal saved
+        for x, y in coords:
+            try:
+                if await dump(x, y):
+                    saved += 1
+            except (httpx.HTTPError, OSError) as e:
+                logger.warning("Error fetching tile: X=%d, Y=%d (%r)", x, y, e)
+    
+    async with make_client(f"{base_url}/{zoom}", max_connections) as client:
+        await asyncio.gather(*(worker() for _ in range(max_workers)))
+    
+    return saved
+
+
+def tile_grid_transform(x_start, y_start, zoom, tile_size):
+    """Return the EPSG:3857 affine transform of a tile grid's pixels."""
+    tile_span = 2 * WEB_MERCATOR_EXTENT / (1 << zoom)
+    left = -WEB_MERCATOR_EXTENT + x_start * tile_span
+    top = WEB_MERCATOR_EXTENT - y_start * tile_span
+    pixel_size = tile_span / tile_size
+    return from_origin(left, top, pixel_size, pixel_size)
+
+
+async def write_geotiff_async(x_start, x_end, y_start, y_end, zoom, base_url, output_filename,
+                              **download_options):
+    """Download tiles and write each one into a tiled, compressed GeoTIFF as it arrives.
+    
+    The mosaic is never held in memory; each tile becomes one window of
+    the output. Returns False (and writes nothing) if no tile was
+    downloaded. Missing tiles are left black.
+    """
+    grid_width = x_end - x_start + 1
+    grid_height = y_end - y_start + 1
+    
+    tiles = iter_tiles_async(x_start, x_end, y_start, y_end, zoom, base_url, **download_options)
+    dst = None
+    try:
+        with contextlib.ExitStack() as stack:
+            async for x, y, tile in tiles:
+                height, width = tile.shape[:2]
+                # Tile size is only known once the first tile is in
+                if dst is None:
+                    dst = stack.enter_context(rasterio.open(
+                        output_filename, "w", driver="GTiff",
+                        width=width * grid_width, height=height * grid_height,
+                        count=3, dtype="uint8", crs="EPSG:3857",
+                        transform=tile_grid_transform(x_start, y_start, zoom, width),
+                        photometric="RGB", tiled=True, blockxsize=256, blockysize=256,
+                        compress="DEFLATE", predictor=2, num_threads="ALL_CPUS",
+                    ))
+                
+                window = Window((x - x_start) * width, (y - y_start) * height, width, height)
+                dst.write(tile.transpose(2, 0, 1), window=window)
+    finally:
+        # Stop the fetchers now rather than when the generator is collected
+        await tiles.aclose()
+    
+    return dst is not None
+
+
+def get_tile_bounds_for_utm_region(ul_x, ul_y, lr_x, lr_y, zoom, utm_zone=32, northern=True):
     """
     Calculate tile indices that cover a UTM region, ensuring we don't exceed the region.
     Returns minimum and maximum tile coordinates that fully contain the region.
     """
-    # Convert UTM corners to lat/lon
-    lat_ul, lon_ul = utm_to_latlon(ul_x, ul_y, zone=utm_zone)
-    lat_lr, lon_lr = utm_to_latlon(lr_x, lr_y, zone=utm_zone)
+    # Convert both UTM corners to lat/lon in one NumPy call, without pyproj;
+    # for two points the Numba bulk path would only add JIT start-up
+    lats, lons = utm_inv(np.array([ul_x, lr_x], dtype=np.float64),
+                         np.array([ul_y, lr_y], dtype=np.float64), zone=utm_zone, northern=northern)
     
-    # Get tile coordinates for all corners
-    x_ul, y_ul = lat_lon_to_tile_indices(lat_ul, lon_ul, zoom)
-    x_lr, y_lr = lat_lon_to_tile_indices(lat_lr, lon_lr, zoom)
+    # Get tile coordinates for both corners at once
+    xs, ys = lat_lon_to_tile_indices(lats, lons, zoom)
     
     # Find the minimum and maximum tile coordinates
-    x_min = min(x_ul, x_lr)
-    x_max = max(x_ul, x_lr)
-    y_min = min(y_ul, y_lr)
-    y_max = max(y_ul, y_lr)
+    x_min, x_max = int(xs.min()), int(xs.max())
+    y_min, y_max = int(ys.min()), int(ys.max())
     
     return x_min, x_max, y_min, y_max
 
@@ -203,12 +579,27 @@ def main():
     parser.add_argument('--zoom', type=int, default=15, help='Zoom level (default: 15)')
     parser.add_argument('--image-type', choices=['superres', 'sentinel2'], default='superres',
                       help='Image type: superres or sentinel2 (default: superres)')
+    parser.add_argument('--format', choices=['tif', 'png'], default='tif',
+                      help='Output format: tiled GeoTIFF in EPSG:3857 or plain PNG (default: tif)')
+    parser.add_argument('--dump-tiles', metavar='DIR',
+                      help='Save the raw WebP tiles to DIR instead of stitching them')
+    parser.add_argument('--cache', type=str,
+                      help='Path of an on-disk tile cache; cached tiles are revalidated with their ETag')
+    parser.add_argument('--verbose', action='store_true', help='Log every tile request')
     args = parser.parse_args()
+    if args.dump_tiles and args.cache:
+        parser.error("--cache cannot be combined with --dump-tiles")
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # httpx logs every request at INFO; per-tile output is opt-in via --verbose
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
     
     # Determine coordinates and UTM zone
     if args.geotiff:
         # Extract info from GeoTIFF
-        utm_zone, ul_x, ul_y, lr_x, lr_y = extract_geotiff_info(args.geotiff)
+        utm_zone, northern, ul_x, ul_y, lr_x, lr_y = extract_geotiff_info(args.geotiff)
         # Generate output filename based on GeoTIFF name
         base_name = os.path.splitext(os.path.basename(args.geotiff))[0]
         file_suffix = f"{base_name}_z{utm_zone}"
@@ -227,8 +618,9 @@ def main():
             lr_x, lr_y = 447220.000, 5830600.000
             default_utm_zone = 33
             
-        # Use provided UTM zone or default
+        # Use provided UTM zone or default; both predefined sets are in the north
         utm_zone = args.utm_zone if args.utm_zone is not None else default_utm_zone
+        northern = True
         file_suffix = f"{dataset}_z{utm_zone}"
     
     # Set zoom level
@@ -242,27 +634,41 @@ def main():
 
     # Calculate tile indices that cover our UTM region
     x_start, x_end, y_start, y_end = get_tile_bounds_for_utm_region(
-        ul_x, ul_y, lr_x, lr_y, ZOOM, utm_zone
+        ul_x, ul_y, lr_x, lr_y, ZOOM, utm_zone, northern
     )
 
-    print(f"UTM Bounds: Upper-left ({ul_x}, {ul_y}), Lower-right ({lr_x}, {lr_y}), Zone: {utm_zone}")
-    print(f"Tile Range: X({x_start} to {x_end}), Y({y_start} to {y_end}), Zoom: {ZOOM}")
+    logger.info("UTM Bounds: Upper-left (%s, %s), Lower-right (%s, %s), Zone: %d%s",
+                ul_x, ul_y, lr_x, lr_y, utm_zone, "N" if northern else "S")
+    logger.info("Tile Range: X(%d to %d), Y(%d to %d), Zoom: %d", x_start, x_end, y_start, y_end, ZOOM)
+
+    # Keep the raw tiles only; nothing is decoded or stitched
+    if args.dump_tiles:
+        os.makedirs(args.dump_tiles, exist_ok=True)
+        saved = asyncio.run(dump_tiles_async(x_start, x_end, y_start, y_end, ZOOM, BASE_URL,
+                                             args.dump_tiles))
+        logger.info("Saved %d tiles to '%s'", saved, args.dump_tiles)
+        return
+
+    # Include image type in output filename
+    output_filename = f"stitched_image_{file_suffix}_{args.image_type}.{args.format}"
 
-    # Download tiles in parallel
-    tiles_dict = download_tiles_parallel(x_start, x_end, y_start, y_end, ZOOM, BASE_URL)
+    # Download tiles concurrently, writing them out as they arrive
+    with shelve.open(args.cache) if args.cache else contextlib.nullcontext() as cache:
+        if args.format == 'tif':
+            saved = asyncio.run(write_geotiff_async(x_start, x_end, y_start, y_end, ZOOM, BASE_URL,
+                                                    output_filename, cache=cache))
+        else:
+            canvas = asyncio.run(download_mosaic_async(x_start, x_end, y_start, y_end, ZOOM, BASE_URL,
+                                                       cache=cache))
+            saved = canvas is not None
+            if saved:
+                save_canvas(canvas, output_filename)
 
     # Handle no tiles downloaded
-    if tiles_dict:
-        stitched_image = stitch_tiles(tiles_dict, 
-                                    (x_start, x_end),
-                                    (y_start, y_end))
-        if stitched_image:
-            # Include image type in output filename
-            output_filename = f"stitched_image_{file_suffix}_{args.image_type}.png"
-            stitched_image.save(output_filename)
-            print(f"Image saved as '{output_filename}'")
+    if saved:
+        logger.info("Image saved as '%s'", output_filename)
     else:
-        print("No tiles were downloaded.")
+        logger.warning("No tiles were downloaded.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+import asyncio
+import concurrent.futures
+import threading
+from io import BytesIO
+
+import httpx
+import numpy as np
+import pytest
+import rasterio
+from PIL import Image
+from rasterio.crs import CRS
+from rasterio.transform import from_origin
+
+import main
+
+
+def webp_tile(size=256, color=(10, 20, 30)):
+    buf = BytesIO()
+    Image.new("RGB", (size, size), color).save(buf, "WEBP")
+    return buf.getvalue()
+
+
+def use_mock_server(monkeypatch, handler):
+    """Route every client made by main through an in-process httpx handler."""
+    def make_client(base_url, max_connections=main.MAX_CONNECTIONS):
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "make_client", make_client)
+
+
+def run_with_timeout(coro_fn, timeout=30):
+    """Run coro_fn() with asyncio.run, failing instead of hanging the test run."""
+    outcome = {}
+    
+    def target():
+        try:
+            outcome["result"] = asyncio.run(coro_fn())
+        except BaseException as e:
+            outcome["error"] = e
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail(f"still running after {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+
+def test_cancelling_large_grid_does_not_hang(monkeypatch):
+    tile = webp_tile()
+    requests_seen = []
+    
+    def handler(request):
+        requests_seen.append(request.url)
+        return httpx.Response(200, content=tile)
+    
+    use_mock_server(monkeypatch, handler)
+    
+    async def cancel_midway():
+        task = asyncio.create_task(main.download_mosaic_async(0, 30, 0, 30, 10, "http://tiles", max_workers=4))
+        while len(requests_seen) < 50:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    run_with_timeout(cancel_midway)
+    assert len(requests_seen) < 31 * 31
+
+
+def test_consumer_error_on_large_grid_is_raised(monkeypatch):
+    tile, big_tile = webp_tile(), webp_tile(512)
+    
+    def handler(request):
+        # An oversized tile at the end of the first row falls outside the canvas
+        return httpx.Response(200, content=big_tile if request.url.path == "/10/9/0.webp" else tile)
+    
+    use_mock_server(monkeypatch, handler)
+    
+    with pytest.raises(ValueError):
+        run_with_timeout(lambda: main.download_mosaic_async(0, 9, 0, 9, 10, "http://tiles", max_workers=2))
+
+
+def test_download_mosaic_places_tiles(monkeypatch):
+    def handler(request):
+        _, _, x, y = request.url.path.split("/")
+        if (x, y) == ("1", "0.webp"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=webp_tile(color=(int(x) * 100, int(y[0]) * 100, 0)))
+    
+    use_mock_server(monkeypatch, handler)
+    
+    canvas = run_with_timeout(lambda: main.download_mosaic_async(0, 1, 0, 1, 10, "http://tiles"))
+    assert canvas.shape == (512, 512, 3)
+    assert np.abs(canvas[128, 128].astype(int) - (0, 0, 0)).max() < 8
+    assert canvas[128, 384].max() == 0  # missing tile stays black
+    assert np.abs(canvas[384, 384].astype(int) - (100, 100, 0)).max() < 8
+
+
+class FailingStream(httpx.AsyncByteStream):
+    """Response body that breaks off after its first chunk."""
+
+    async def __aiter__(self):
+        yield b"x" * 65536
+        raise httpx.ReadError("connection lost")
+
+
+def test_dump_tiles_leaves_no_partial_files(monkeypatch, tmp_path):
+    def handler(request):
+        if request.url.path == "/10/0/0.webp":
+            return httpx.Response(200, stream=FailingStream())
+        return httpx.Response(200, content=webp_tile())
+    
+    use_mock_server(monkeypatch, handler)
+    
+    saved = run_with_timeout(lambda: main.dump_tiles_async(0, 1, 0, 0, 10, "http://tiles", str(tmp_path)))
+    assert saved == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["10_1_0.webp"]
+
+
+@pytest.mark.parametrize("corners, zone", [
+    ((605020, 5546440, 609240, 5542220), 32),
+    ((443040.0, 5834800.0, 447220.0, 5830600.0), 33),
+])
+def test_tile_bounds_match_pyproj(corners, zone):
+    ul_x, ul_y, lr_x, lr_y = corners
+    lats, lons = main.utm_to_latlon_many([ul_x, lr_x], [ul_y, lr_y], zone=zone)
+    xs, ys = main.lat_lon_to_tile_indices(lats, lons, 15)
+    expected = (xs.min(), xs.max(), ys.min(), ys.max())
+    assert main.get_tile_bounds_for_utm_region(ul_x, ul_y, lr_x, lr_y, 15, zone) == expected
+
+
+def test_utm_inv_matches_pyproj():
+    xs = np.linspace(300000, 700000, 50)
+    ys = np.linspace(100000, 7500000, 50)
+    lats, lons = main.utm_inv(xs, ys, 32)
+    ref_lats, ref_lons = main.utm_to_latlon_many(xs, ys, 32)
+    np.testing.assert_allclose(lats, ref_lats, atol=1e-6)
+    np.testing.assert_allclose(lons, ref_lons, atol=1e-6)
+
+
+def flaky_handler(failures, status=503):
+    """Answer each tile with `failures` error responses before serving it."""
+    attempts = {}
+    tile = webp_tile()
+    
+    def handler(request):
+        attempts[request.url.path] = attempts.get(request.url.path, 0) + 1
+        if attempts[request.url.path] <= failures:
+            return httpx.Response(status)
+        return httpx.Response(200, content=tile)
+    
+    return handler, attempts
+
+
+def test_download_tile_retries_server_errors(monkeypatch):
+    monkeypatch.setattr(main, "RETRY_BACKOFF", 0)
+    handler, attempts = flaky_handler(failures=2)
+    use_mock_server(monkeypatch, handler)
+    
+    canvas = run_with_timeout(lambda: main.download_mosaic_async(0, 1, 0, 0, 10, "http://tiles"))
+    assert canvas.shape == (256, 512, 3)
+    assert attempts == {"/10/0/0.webp": 3, "/10/1/0.webp": 3}
+
+
+def test_download_tile_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(main, "RETRY_BACKOFF", 0)
+    handler, attempts = flaky_handler(failures=10, status=429)
+    use_mock_server(monkeypatch, handler)
+    
+    canvas = run_with_timeout(lambda: main.download_mosaic_async(0, 0, 0, 0, 10, "http://tiles"))
+    assert canvas is None
+    assert attempts == {"/10/0/0.webp": main.MAX_RETRIES + 1}
+
+
+def test_dump_tiles_retries_server_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "RETRY_BACKOFF", 0)
+    handler, attempts = flaky_handler(failures=1, status=500)
+    use_mock_server(monkeypatch, handler)
+    
+    saved = run_with_timeout(lambda: main.dump_tiles_async(0, 1, 0, 0, 10, "http://tiles", str(tmp_path)))
+    assert saved == 2
+    assert attempts == {"/10/0/0.webp": 2, "/10/1/0.webp": 2}
+
+
+def write_geotiff(path, crs, ulx, uly):
+    with rasterio.open(path, "w", driver="GTiff", width=10, height=10, count=1, dtype="uint8",
+                       crs=crs, transform=from_origin(ulx, uly, 10, 10)) as dst:
+        dst.write(np.zeros((1, 10, 10), dtype=np.uint8))
+
+
+@pytest.mark.parametrize("crs, expected", [
+    (CRS.from_epsg(32632), (32, True)),
+    (CRS.from_epsg(32733), (33, False)),
+    (CRS.from_user_input("+proj=utm +zone=33 +ellps=GRS80 +units=m"), (33, True)),
+    (CRS.from_user_input("+proj=utm +zone=19 +south +ellps=intl +units=m"), (19, False)),
+    (CRS.from_epsg(4326), None),
+    (None, None),
+])
+def test_utm_zone_from_crs(crs, expected):
+    assert main.utm_zone_from_crs(crs) == expected
+
+
+def test_utm_zone_from_wkt_keeps_hemisphere():
+    class CustomUTM:
+        """A projected CRS with no EPSG code, as written by some tools."""
+        is_projected = True
+        wkt = 'PROJCS["WGS 84 / UTM zone 33S",GEOGCS["WGS 84"]]'
+        
+        def to_epsg(self):
+            return None
+    
+    assert main.utm_zone_from_crs(CustomUTM()) == (33, False)
+
+
+def test_southern_geotiff_tile_bounds(tmp_path):
+    # Cape Town, UTM zone 34S
+    path = str(tmp_path / "south.tif")
+    write_geotiff(path, "EPSG:32734", 260000, 6245000)
+    utm_zone, northern, ulx, uly, lrx, lry = main.extract_geotiff_info(path)
+    assert (utm_zone, northern) == (34, False)
+    
+    bounds = main.get_tile_bounds_for_utm_region(ulx, uly, lrx, lry, 15, utm_zone, northern)
+    lats, lons = main.utm_to_latlon_many([ulx, lrx], [uly, lry], zone=34, northern=False)
+    assert lats.max() < -33
+    xs, ys = main.lat_lon_to_tile_indices(lats, lons, 15)
+    assert bounds == (xs.min(), xs.max(), ys.min(), ys.max())
+
+
+def colored_tile_handler(missing=()):
+    """Serve each tile in a colour derived from its x/y, 404 for `missing`."""
+    def handler(request):
+        _, _, x, y = request.url.path.split("/")
+        x, y = int(x), int(y.split(".")[0])
+        if (x, y) in missing:
+            return httpx.Response(404)
+        return httpx.Response(200, content=webp_tile(color=(x % 2 * 200, y % 2 * 200, 50)))
+    return handler
+
+
+def test_write_geotiff(monkeypatch, tmp_path):
+    use_mock_server(monkeypatch, colored_tile_handler(missing={(11, 20)}))
+    path = str(tmp_path / "mosaic.tif")
+    
+    saved = run_with_timeout(lambda: main.write_geotiff_async(10, 11, 20, 21, 6, "http://tiles", path))
+    assert saved is True
+    with rasterio.open(path) as src:
+        assert src.crs == CRS.from_epsg(3857)
+        assert (src.width, src.height, src.count) == (512, 512, 3)
+        assert src.transform == main.tile_grid_transform(10, 20, 6, 256)
+        assert src.block_shapes == [(256, 256)] * 3
+        assert src.compression.name.upper() == "DEFLATE"
+        pixels = src.read().transpose(1, 2, 0).astype(int)
+        bounds = src.bounds
+    
+    # Web Mercator corners of tiles x=10..11, y=20..21 at zoom 6
+    span = 2 * main.WEB_MERCATOR_EXTENT / 64
+    assert bounds.left == pytest.approx(-main.WEB_MERCATOR_EXTENT + 10 * span)
+    assert bounds.right == pytest.approx(-main.WEB_MERCATOR_EXTENT + 12 * span)
+    assert bounds.top == pytest.approx(main.WEB_MERCATOR_EXTENT - 20 * span)
+    assert bounds.bottom == pytest.approx(main.WEB_MERCATOR_EXTENT - 22 * span)
+    
+    assert np.abs(pixels[128, 128] - (0, 0, 50)).max() < 8        # (10, 20)
+    assert pixels[128, 384].max() == 0                            # (11, 20) missing
+    assert np.abs(pixels[384, 128] - (0, 200, 50)).max() < 8      # (10, 21)
+    assert np.abs(pixels[384, 384] - (200, 200, 50)).max() < 8    # (11, 21)
+
+
+def test_write_geotiff_without_tiles(monkeypatch, tmp_path):
+    use_mock_server(monkeypatch, lambda request: httpx.Response(404))
+    path = tmp_path / "mosaic.tif"
+    
+    saved = run_with_timeout(lambda: main.write_geotiff_async(10, 11, 20, 21, 6, "http://tiles", str(path)))
+    assert saved is False
+    assert not path.exists()
+
+
+def test_etag_cache_revalidates_tiles(monkeypatch):
+    tile = webp_tile(color=(200, 100, 50))
+    seen = []
+    
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=tile, headers={"ETag": '"v1"'})
+    
+    use_mock_server(monkeypatch, handler)
+    cache = {}
+    
+    def run():
+        return run_with_timeout(lambda: main.download_mosaic_async(0, 1, 0, 0, 10, "http://tiles", cache=cache))
+    
+    first = run()
+    assert seen == [None, None]
+    assert sorted(cache) == ["http://tiles/10/0/0.webp", "http://tiles/10/1/0.webp"]
+    
+    seen.clear()
+    second = run()
+    assert seen == ['"v1"', '"v1"']
+    assert np.array_equal(first, second)
+    assert np.abs(second[128, 384].astype(int) - (200, 100, 50)).max() < 8
+
+
+def test_identical_tiles_are_decoded_once(monkeypatch):
+    # Decode in-process so calls to _decode_webp can be counted
+    monkeypatch.setattr(main.concurrent.futures, "ProcessPoolExecutor",
+                        lambda mp_context=None: concurrent.futures.ThreadPoolExecutor(1))
+    decode_calls = []
+    
+    def counting_decode(raw):
+        decode_calls.append(len(raw))
+        return decode_webp(raw)
+    
+    decode_webp = main._decode_webp
+    monkeypatch.setattr(main, "_decode_webp", counting_decode)
+    ocean, land = webp_tile(color=(0, 0, 80)), webp_tile(color=(90, 120, 60))
+    use_mock_server(monkeypatch, lambda request: httpx.Response(
+        200, content=land if request.url.path == "/10/2/2.webp" else ocean))
+    
+    canvas = run_with_timeout(lambda: main.download_mosaic_async(0, 4, 0, 4, 10, "http://tiles", max_workers=1))
+    assert len(decode_calls) == 2
+    assert np.abs(canvas[1100, 1100].astype(int) - (0, 0, 80)).max() < 8
+    assert np.abs(canvas[640, 640].astype(int) - (90, 120, 60)).max() < 8